@@ -267,6 +267,7 @@ namespace WebApp.Data
 
                 // Create indexes for performance
                 entity.HasIndex(e => new { e.Symbol, e.TimeFrame, e.OpenTime })
+                      .IsUnique()
                       .HasDatabaseName("IX_MarketData_Symbol_TimeFrame_OpenTime");
                       
                 entity.HasIndex(e => e.OpenTime)
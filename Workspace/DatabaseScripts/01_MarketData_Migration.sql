@@ -93,14 +93,22 @@ BEGIN
     PRINT 'ℹ️  IX_MarketData_OpenTime already exists';
 END
 
--- Composite index for complex trading bot queries
+-- Composite index for complex trading bot queries (unique so importers can MERGE without creating duplicate candles)
 IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_MarketData_Symbol_TimeFrame_OpenTime' AND object_id = OBJECT_ID('[dbo].[MarketData]'))
 BEGIN
     PRINT '🔍 Creating comprehensive Symbol + TimeFrame + OpenTime index...';
-    CREATE NONCLUSTERED INDEX [IX_MarketData_Symbol_TimeFrame_OpenTime] 
+    CREATE UNIQUE NONCLUSTERED INDEX [IX_MarketData_Symbol_TimeFrame_OpenTime] 
         ON [dbo].[MarketData] ([Symbol], [TimeFrame], [OpenTime]);
     PRINT '✅ IX_MarketData_Symbol_TimeFrame_OpenTime created';
 END
+ELSE IF EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_MarketData_Symbol_TimeFrame_OpenTime' AND object_id = OBJECT_ID('[dbo].[MarketData]') AND is_unique = 0)
+BEGIN
+    PRINT '🔍 Making Symbol + TimeFrame + OpenTime index unique...';
+    CREATE UNIQUE NONCLUSTERED INDEX [IX_MarketData_Symbol_TimeFrame_OpenTime] 
+        ON [dbo].[MarketData] ([Symbol], [TimeFrame], [OpenTime])
+        WITH (DROP_EXISTING = ON);
+    PRINT '✅ IX_MarketData_Symbol_TimeFrame_OpenTime is now unique';
+END
 ELSE
 BEGIN
     PRINT 'ℹ️  IX_MarketData_Symbol_TimeFrame_OpenTime already exists';
@@ -8,37 +8,291 @@ Features:
 - 📊 Progress tracking with percentage completion  
 - 🔄 Batch processing for efficiency
 - 🛡️ Error recovery - can restart where it left off
+- ⚡ Parallel API fetching (asyncio + aiohttp)
 - ⏰ Rate limiting to respect Binance API limits
-- 🚫 Duplicate prevention
+- 🚫 Duplicate prevention (unique index + MERGE)
+- 🗂️ Optional per-day Parquet cache for analytics (--parquet, needs pyarrow)
 - 📈 Real-time statistics and ETA
 """
 
-import pymssql
-import requests
+import argparse
+import asyncio
+import aiohttp
+import json
+import os
+import tempfile
 import time
+import numpy as np
+import pandas as pd
+import pyodbc
+from collections import deque
 from datetime import datetime, timezone, timedelta
-from typing import List, Tuple, Optional
+from itertools import repeat
+from typing import Iterator, List, Tuple, Optional
 import sys
 
+try:
+    import orjson  # Roughly twice as fast as json for the kline responses
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Progress bar pieces are built once and sliced per report
+BAR_LENGTH = 30
+BAR_FULL = '█' * BAR_LENGTH
+BAR_EMPTY = '░' * BAR_LENGTH
+
+# Column layout of the Parquet cache: dictionary-encoded labels, float32 OHLCV, UTC timestamps
+PARQUET_SCHEMA = pa.schema([
+    ('symbol', pa.dictionary(pa.int8(), pa.string())),
+    ('timeframe', pa.dictionary(pa.int8(), pa.string())),
+    ('open_time', pa.timestamp('ms', tz='UTC')),
+    ('open', pa.float32()),
+    ('high', pa.float32()),
+    ('low', pa.float32()),
+    ('close', pa.float32()),
+    ('volume', pa.float32()),
+    ('close_time', pa.timestamp('ms', tz='UTC')),
+]) if pa is not None else None
+
+DAY_MS = 86_400_000
+
+class WeightRateLimiter:
+    """Async request limiter driven by Binance's X-MBX-USED-WEIGHT-1M header"""
+    
+    def __init__(self, max_weight_per_minute: int, request_weight: int):
+        self.max_weight = max_weight_per_minute
+        self.request_weight = request_weight
+        self.used_weight = 0          # Latest weight reported by Binance
+        self._reported_minute = None  # Clock minute the reported weight belongs to
+        self._sent = deque()          # time.monotonic() of requests sent during the last 60 s
+        self._lock = asyncio.Lock()
+    
+    def update(self, headers):
+        """Record the used weight from a Binance response"""
+        if 'X-MBX-USED-WEIGHT-1M' in headers:
+            self.used_weight = int(headers['X-MBX-USED-WEIGHT-1M'])
+            self._reported_minute = int(time.time() // 60)
+    
+    async def __aenter__(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= 60:
+                    self._sent.popleft()
+                
+                # Binance counts weight per clock minute and includes other clients on the same IP,
+                # so its number wins while it is current. Our own sliding count covers requests in flight.
+                reported = self.used_weight if self._reported_minute == int(time.time() // 60) else 0
+                local = len(self._sent) * self.request_weight
+                
+                if reported + self.request_weight > self.max_weight:
+                    wait = 60 - time.time() % 60  # Until Binance resets the window
+                elif local + self.request_weight > self.max_weight:
+                    wait = 60 - (now - self._sent[0])  # Until our oldest request leaves the window
+                else:
+                    self._sent.append(now)
+                    return self
+                
+                await asyncio.sleep(wait)
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
 class BTCDataImporter:
     def __init__(self):
         self.binance_api_url = "https://api.binance.com/api/v3/klines"
         self.symbol = "BTCUSDT"
         self.interval = "1m"
         self.limit = 1000  # Max records per API call
+        self.batch_span_ms = self.limit * 60_000  # 1000 x 1m candles per batch
+        
+        # Parallel fetching - Binance allows 1200 request weight/min, keep a little headroom
+        self.max_concurrent_requests = 8
+        self.max_weight_per_minute = 1150
+        self.request_weight = 2  # Weight of one /klines call
+        self.max_retries = 5
         
         # Binance BTC/USDT trading started August 17, 2017
         self.start_timestamp = int(datetime(2017, 8, 17, tzinfo=timezone.utc).timestamp() * 1000)
         
+        # One connection is kept open for the whole import instead of a new login per batch
+        self._conn = None
+        
+        # MarketData index / database settings, read once per run by load_metadata()
+        self._indexes = None             # name -> (is_unique, is_disabled)
+        self._delayed_durability = None  # DISABLED / ALLOWED / FORCED
+        
+        # BULK INSERT via a tab-separated staging file, flushed and committed every N batches (~50k rows).
+        # The staging directory must be readable by SQL Server (same host or a shared volume),
+        # otherwise the importer falls back to fast_executemany.
+        self.use_bulk_insert = True
+        self.bulk_staging_dir = tempfile.gettempdir()
+        self.bulk_flush_batches = 50
+        self._staging_file = None  # Open TSV file rows are streamed into until the next flush
+        self._pending_rows = []    # Only used once BULK INSERT has been found unavailable
+        self._pending_batches = 0
+        
+        # Per-day Parquet files next to the database rows (data/BTC/1m/YYYY-MM-DD.parquet).
+        # Opt-in with --parquet (needs pyarrow): a full history is a few thousand files under the working directory.
+        self.write_parquet = False
+        self.parquet_dir = os.path.join('data', 'BTC', self.interval)
+        self._parquet_day = None     # Day number (open_time // DAY_MS) currently being collected
+        self._parquet_chunks = []    # pyarrow tables for that day
+        
     def get_database_connection(self):
-        """Get database connection"""
-        return pymssql.connect(
-            server='localhost',
-            port=1433,
-            user='sa',
-            password='MyPassword123#',
-            database='MyFirstDatabase'
-        )
+        """Get the shared database connection (opened on first use)"""
+        if self._conn is None:
+            self._conn = pyodbc.connect(
+                "DRIVER={ODBC Driver 18 for SQL Server};"
+                "SERVER=localhost,1433;"
+                "DATABASE=MyFirstDatabase;"
+                "UID=sa;PWD=MyPassword123#;"
+                "TrustServerCertificate=yes"
+            )
+        return self._conn
+    
+    def close_database_connection(self):
+        """Close the shared database connection"""
+        if self._conn is not None:
+            try:
+                # Harden any delayed durable commits before disconnecting
+                self._conn.execute("EXEC sys.sp_flush_log")
+            except pyodbc.Error:
+                pass
+            self._conn.close()
+            self._conn = None
+    
+    def load_metadata(self):
+        """Read MarketData's nonclustered indexes and the delayed durability setting in one round trip"""
+        conn = self.get_database_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SET NOCOUNT ON;
+                SELECT name, is_unique, is_disabled FROM sys.indexes
+                WHERE object_id = OBJECT_ID('[dbo].[MarketData]') AND type_desc = 'NONCLUSTERED';
+                SELECT delayed_durability_desc FROM sys.databases WHERE database_id = DB_ID();
+            """)
+            self._indexes = {row[0]: (bool(row[1]), bool(row[2])) for row in cursor.fetchall()}
+            cursor.nextset()
+            self._delayed_durability = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    
+    def enable_delayed_durability(self):
+        """Allow transactions to opt in to delayed durability (no log flush wait per commit)"""
+        if self._delayed_durability is None:
+            self.load_metadata()
+        if self._delayed_durability in ('ALLOWED', 'FORCED'):
+            return
+        
+        conn = self.get_database_connection()
+        conn.autocommit = True  # ALTER DATABASE cannot run inside a transaction
+        
+        try:
+            conn.execute("ALTER DATABASE CURRENT SET DELAYED_DURABILITY = ALLOWED")
+            self._delayed_durability = 'ALLOWED'
+        except pyodbc.Error as e:
+            # Without ALLOWED the commits below are simply fully durable
+            print(f"ℹ️ Delayed durability ej tillgängligt: {e}")
+        finally:
+            conn.autocommit = False
+    
+    def commit_checkpoint(self):
+        """Commit everything loaded since the last checkpoint"""
+        conn = self.get_database_connection()
+        conn.execute("IF @@TRANCOUNT > 0 COMMIT TRANSACTION WITH (DELAYED_DURABILITY = ON)")
+    
+    def ensure_unique_index(self):
+        """Create the unique (Symbol, TimeFrame, OpenTime) index that makes inserts idempotent"""
+        if self._indexes is None:
+            self.load_metadata()
+        existing = self._indexes.get('IX_MarketData_Symbol_TimeFrame_OpenTime')
+        if existing is not None and existing[0]:
+            return
+        
+        conn = self.get_database_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Replace the plain composite index in place rather than keeping a second copy of the same keys
+            cursor.execute(f"""
+                CREATE UNIQUE NONCLUSTERED INDEX [IX_MarketData_Symbol_TimeFrame_OpenTime]
+                    ON [dbo].[MarketData] ([Symbol], [TimeFrame], [OpenTime])
+                    {'WITH (DROP_EXISTING = ON)' if existing is not None else ''};
+            """)
+            conn.commit()
+            self._indexes['IX_MarketData_Symbol_TimeFrame_OpenTime'] = (True, False)
+        except pyodbc.Error as e:
+            # Typically existing duplicates - MERGE still skips rows that already exist
+            conn.rollback()
+            print(f"⚠️ Kunde inte skapa unikt index på (Symbol, TimeFrame, OpenTime): {e}")
+        finally:
+            cursor.close()
+    
+    def disable_secondary_indexes(self) -> List[str]:
+        """Disable non-unique nonclustered indexes before a full-history load, returns their names"""
+        if self._indexes is None:
+            self.load_metadata()
+        
+        # The unique index stays enabled - the MERGE needs it to find existing rows
+        index_names = [name for name, (is_unique, is_disabled) in self._indexes.items()
+                       if not is_unique and not is_disabled]
+        if not index_names:
+            return []
+        
+        conn = self.get_database_connection()
+        cursor = conn.cursor()
+        
+        try:
+            for name in index_names:
+                cursor.execute(f"ALTER INDEX [{name}] ON [dbo].[MarketData] DISABLE")
+            conn.commit()
+            for name in index_names:
+                self._indexes[name] = (False, True)
+            
+            print(f"⚡ Index avstängda under import: {', '.join(index_names)}")
+            return index_names
+            
+        except pyodbc.Error as e:
+            conn.rollback()
+            print(f"⚠️ Kunde inte stänga av index: {e}")
+            return []
+        finally:
+            cursor.close()
+    
+    def rebuild_indexes(self):
+        """Rebuild (and thereby re-enable) every disabled non-unique index, also ones a crashed run left disabled"""
+        if self._indexes is None:
+            self.load_metadata()
+        
+        index_names = [name for name, (is_unique, is_disabled) in self._indexes.items()
+                       if not is_unique and is_disabled]
+        if not index_names:
+            return
+        
+        conn = self.get_database_connection()
+        conn.rollback()  # Anything not committed at a checkpoint is fetched again next run
+        conn.autocommit = True
+        
+        try:
+            for name in index_names:
+                print(f"🔨 Bygger om index {name}...")
+                conn.execute(f"ALTER INDEX [{name}] ON [dbo].[MarketData] REBUILD WITH (SORT_IN_TEMPDB = ON, ONLINE = OFF)")
+                self._indexes[name] = (False, False)
+        except pyodbc.Error as e:
+            print(f"❌ Kunde inte bygga om index: {e}")
+        finally:
+            conn.autocommit = False
     
     def get_latest_timestamp(self) -> Optional[int]:
         """Get the latest OpenTime timestamp from database for BTC 1m data"""
@@ -46,18 +300,21 @@ class BTCDataImporter:
         cursor = conn.cursor()
         
         try:
+            # Backward seek on IX_MarketData_Symbol_TimeFrame_OpenTime - reads a single index row
             cursor.execute("""
-                SELECT MAX(OpenTime) 
+                SELECT TOP 1 OpenTime 
                 FROM MarketData 
-                WHERE Symbol = %s AND TimeFrame = %s
+                WHERE Symbol = ? AND TimeFrame = ?
+                ORDER BY OpenTime DESC
             """, ('BTC', '1m'))
             
             result = cursor.fetchone()
-            latest_time = result[0] if result[0] else None
+            latest_time = result[0] if result else None
             
             if latest_time:
-                # Convert to timestamp (milliseconds) and add 1 minute to avoid duplicates
-                timestamp = int(latest_time.timestamp() * 1000) + 60000
+                # OpenTime is stored in UTC. Add 1 minute to start at the next candle
+                # (re-imported rows are skipped by the MERGE anyway)
+                timestamp = int(latest_time.replace(tzinfo=timezone.utc).timestamp() * 1000) + 60000
                 print(f"📅 Latest data in DB: {latest_time}")
                 return timestamp
             else:
@@ -69,48 +326,161 @@ class BTCDataImporter:
             return self.start_timestamp
         finally:
             cursor.close()
-            conn.close()
     
-    def fetch_klines(self, start_time: int, end_time: Optional[int] = None) -> List:
-        """Fetch kline data from Binance API"""
+    async def fetch_klines(self, session: aiohttp.ClientSession, limiter: WeightRateLimiter,
+                           start_time: int, end_time: int) -> Optional[List]:
+        """Fetch the klines of one fixed [start_time, end_time] window from Binance API, None if the fetch failed"""
         params = {
             'symbol': self.symbol,
             'interval': self.interval,
             'startTime': start_time,
+            'endTime': end_time,
             'limit': self.limit
         }
         
-        if end_time:
-            params['endTime'] = end_time
+        backoff = 1
+        for _ in range(self.max_retries):
+            try:
+                async with limiter:
+                    async with session.get(self.binance_api_url, params=params) as response:
+                        limiter.update(response.headers)
+                        
+                        if response.status in (418, 429):
+                            # Rate limited - respect Retry-After and back off exponentially on repeats
+                            retry_after = max(int(response.headers.get('Retry-After', 0)), backoff)
+                            reason = f"Rate limit (HTTP {response.status}, weight {limiter.used_weight})"
+                        elif response.status in (500, 502, 503, 504):
+                            retry_after = backoff
+                            reason = f"Serverfel (HTTP {response.status})"
+                        else:
+                            response.raise_for_status()
+                            return await response.json(loads=json_loads)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Transient network problems are retried instead of leaving a 1000-minute gap
+                retry_after = backoff
+                reason = f"Anslutningsfel ({str(e) or type(e).__name__})"
+            except aiohttp.ClientError as e:
+                print(f"❌ API Error: {e}")
+                return None
+            
+            print(f"⏳ {reason} - väntar {retry_after}s")
+            await asyncio.sleep(retry_after)
+            backoff *= 2
         
-        try:
-            response = requests.get(self.binance_api_url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"❌ API Error: {e}")
-            return []
+        print(f"❌ API Error: gav upp efter {self.max_retries} försök (startTime={start_time})")
+        return None
     
-    def convert_kline_to_db_format(self, kline: List) -> Tuple:
-        """Convert Binance kline format to database format"""
+    def parse_klines(self, klines: List) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Split a batch of Binance klines into open times, OHLCV prices and close times"""
         # Binance kline format: [open_time, open, high, low, close, volume, close_time, ...]
-        open_time = datetime.fromtimestamp(kline[0] / 1000, tz=timezone.utc)
-        close_time = datetime.fromtimestamp(kline[6] / 1000, tz=timezone.utc)
-        
-        return (
-            'BTC',                    # Symbol
-            '1m',                     # TimeFrame
-            open_time,                # OpenTime
-            float(kline[1]),          # OpenPrice
-            float(kline[2]),          # HighPrice
-            float(kline[3]),          # LowPrice
-            float(kline[4]),          # ClosePrice
-            float(kline[5]),          # Volume
-            close_time                # CloseTime
+        # One numeric conversion for the first 7 columns - ms timestamps are exact in float64
+        arr = np.array([kline[:7] for kline in klines], dtype=np.float64)
+        open_ms = arr[:, 0].astype(np.int64)
+        prices = arr[:, 1:6]  # open, high, low, close, volume
+        close_ms = arr[:, 6].astype(np.int64)
+        return open_ms, prices, close_ms
+    
+    def convert_klines_to_db_format(self, open_ms: np.ndarray, prices: np.ndarray,
+                                    close_ms: np.ndarray) -> Iterator[Tuple]:
+        """Convert parsed klines to database format (vectorized)"""
+        open_times = pd.to_datetime(open_ms, unit='ms', utc=True).to_pydatetime()
+        close_times = pd.to_datetime(close_ms, unit='ms', utc=True).to_pydatetime()
+        open_prices, high_prices, low_prices, close_prices, volumes = prices.T.tolist()
+        
+        return zip(
+            repeat('BTC'),            # Symbol
+            repeat('1m'),             # TimeFrame
+            open_times,               # OpenTime
+            open_prices,              # OpenPrice
+            high_prices,              # HighPrice
+            low_prices,               # LowPrice
+            close_prices,             # ClosePrice
+            volumes,                  # Volume
+            close_times               # CloseTime
         )
     
+    def _parquet_table(self, open_ms: np.ndarray, prices: np.ndarray, close_ms: np.ndarray):
+        """Build a pyarrow table in the Parquet cache layout"""
+        labels = np.zeros(len(open_ms), dtype=np.int8)
+        prices32 = np.asfortranarray(prices, dtype=np.float32)  # Contiguous columns
+        return pa.Table.from_arrays([
+            pa.DictionaryArray.from_arrays(labels, ['BTC']),
+            pa.DictionaryArray.from_arrays(labels, [self.interval]),
+            pa.array(open_ms, type=pa.timestamp('ms', tz='UTC')),
+            *(pa.array(prices32[:, i]) for i in range(5)),
+            pa.array(close_ms, type=pa.timestamp('ms', tz='UTC'))
+        ], schema=PARQUET_SCHEMA)
+    
+    def _parquet_path(self, day: int) -> str:
+        date = datetime.fromtimestamp(day * DAY_MS / 1000, tz=timezone.utc)
+        return os.path.join(self.parquet_dir, f"{date.strftime('%Y-%m-%d')}.parquet")
+    
+    def cache_parquet(self, open_ms: np.ndarray, prices: np.ndarray, close_ms: np.ndarray):
+        """Collect parsed klines per UTC day, writing each day's Parquet file when the day rolls over"""
+        days = open_ms // DAY_MS
+        # Klines arrive in order, so a batch is at most a few runs of equal days
+        bounds = [0, *(np.flatnonzero(np.diff(days)) + 1), len(days)]
+        
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            day = int(days[lo])
+            if day != self._parquet_day:
+                self.flush_parquet_day()
+                self._parquet_day = day
+                # Resumed mid-day: keep what an earlier run already cached for this day
+                path = self._parquet_path(day)
+                if os.path.exists(path):
+                    cached = pq.read_table(path, schema=PARQUET_SCHEMA)
+                    first_open = pa.scalar(int(open_ms[lo]), type=pa.timestamp('ms', tz='UTC'))
+                    self._parquet_chunks.append(cached.filter(pc.less(cached['open_time'], first_open)))
+            
+            self._parquet_chunks.append(self._parquet_table(open_ms[lo:hi], prices[lo:hi], close_ms[lo:hi]))
+    
+    def flush_parquet_day(self):
+        """Write the day collected so far to its Parquet file"""
+        chunks, self._parquet_chunks = self._parquet_chunks, []
+        if not chunks:
+            return
+        
+        try:
+            os.makedirs(self.parquet_dir, exist_ok=True)
+            pq.write_table(pa.concat_tables(chunks), self._parquet_path(self._parquet_day), compression='zstd')
+        except Exception as e:
+            print(f"⚠️ Kunde inte skriva Parquet-fil: {e}")
+    
+    def _prepare_staging_table(self, cursor):
+        """Create (once per connection) and empty the #MarketDataStaging temp table"""
+        # Same columns as the insert (no Id/CreatedAt) and no indexes, so loading it is cheap.
+        # Prices are FLOAT so values like 1e-05 load and convert to DECIMAL in the MERGE.
+        cursor.execute("""
+            IF OBJECT_ID('tempdb..#MarketDataStaging') IS NULL
+                CREATE TABLE #MarketDataStaging (
+                    Symbol NVARCHAR(10) NOT NULL,
+                    TimeFrame NVARCHAR(10) NOT NULL,
+                    OpenTime DATETIME2(7) NOT NULL,
+                    OpenPrice FLOAT NOT NULL,
+                    HighPrice FLOAT NOT NULL,
+                    LowPrice FLOAT NOT NULL,
+                    ClosePrice FLOAT NOT NULL,
+                    Volume FLOAT NOT NULL,
+                    CloseTime DATETIME2(7) NOT NULL
+                );
+            TRUNCATE TABLE #MarketDataStaging;
+        """)
+    
+    def _merge_staging_table(self, cursor) -> int:
+        """Insert staged rows that are not already in MarketData, returns number of new rows"""
+        cursor.execute("""
+            MERGE MarketData AS t
+            USING #MarketDataStaging AS s
+                ON t.Symbol = s.Symbol AND t.TimeFrame = s.TimeFrame AND t.OpenTime = s.OpenTime
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime)
+                VALUES (s.Symbol, s.TimeFrame, s.OpenTime, s.OpenPrice, s.HighPrice, s.LowPrice, s.ClosePrice, s.Volume, s.CloseTime);
+        """)
+        return cursor.rowcount
+    
     def bulk_insert_data(self, data_batch: List[Tuple]) -> int:
-        """Insert batch of data into database"""
+        """Insert batch of data into database (the caller commits)"""
         if not data_batch:
             return 0
         
@@ -118,26 +488,102 @@ class BTCDataImporter:
         cursor = conn.cursor()
         
         try:
-            # Use executemany for efficient bulk insert
+            self._prepare_staging_table(cursor)
+            
+            # fast_executemany binds the whole batch as parameter arrays and sends it
+            # in one round trip instead of one INSERT per row
+            cursor.fast_executemany = True
+            # Fixed input sizes so pyodbc doesn't have to sniff the types of every row
+            cursor.setinputsizes([
+                (pyodbc.SQL_WVARCHAR, 10, 0),       # Symbol
+                (pyodbc.SQL_WVARCHAR, 10, 0),       # TimeFrame
+                (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7), # OpenTime
+                (pyodbc.SQL_FLOAT, 0, 0),           # OpenPrice
+                (pyodbc.SQL_FLOAT, 0, 0),           # HighPrice
+                (pyodbc.SQL_FLOAT, 0, 0),           # LowPrice
+                (pyodbc.SQL_FLOAT, 0, 0),           # ClosePrice
+                (pyodbc.SQL_FLOAT, 0, 0),           # Volume
+                (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7), # CloseTime
+            ])
             cursor.executemany("""
-                INSERT INTO MarketData 
+                INSERT INTO #MarketDataStaging 
                 (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, data_batch)
-            
-            conn.commit()
-            return len(data_batch)
+            return self._merge_staging_table(cursor)
             
         except Exception as e:
             print(f"❌ Database insert error: {e}")
+            # The rollback drops the whole uncommitted checkpoint - stop so the next run
+            # re-fetches it from MAX(OpenTime) instead of committing later checkpoints past the hole
             conn.rollback()
-            return 0
+            raise
+        finally:
+            cursor.close()
+    
+    def stage_rows(self, rows: Iterator[Tuple]):
+        """Stream converted rows into the BULK INSERT staging file (or memory once BULK INSERT is off)"""
+        if not self.use_bulk_insert:
+            self._pending_rows.extend(rows)
+            return
+        
+        if self._staging_file is None:
+            self._staging_file = tempfile.NamedTemporaryFile('w', dir=self.bulk_staging_dir, suffix='.tsv', delete=False,
+                                                             encoding='utf-8', newline='\n')
+        self._staging_file.writelines(
+            f"{row[0]}\t{row[1]}\t{row[2]:%Y-%m-%d %H:%M:%S.%f}\t{row[3]}\t{row[4]}\t"
+            f"{row[5]}\t{row[6]}\t{row[7]}\t{row[8]:%Y-%m-%d %H:%M:%S.%f}\n"
+            for row in rows
+        )
+    
+    def read_staging_file(self, staging_file: str) -> List[Tuple]:
+        """Read a TSV staging file back into rows (fallback when the server cannot read it)"""
+        data_batch = []
+        with open(staging_file, encoding='utf-8') as f:
+            for line in f:
+                symbol, timeframe, open_time, o, h, l, c, v, close_time = line.rstrip('\n').split('\t')
+                data_batch.append((
+                    symbol, timeframe, datetime.fromisoformat(open_time),
+                    float(o), float(h), float(l), float(c), float(v),
+                    datetime.fromisoformat(close_time)
+                ))
+        return data_batch
+    
+    def bulk_load_file(self, staging_file: str) -> int:
+        """Load a staging file with BULK INSERT (the caller commits)"""
+        conn = self.get_database_connection()
+        cursor = conn.cursor()
+        
+        try:
+            os.chmod(staging_file, 0o644)  # SQL Server reads the file as its own service user
+            
+            self._prepare_staging_table(cursor)
+            # BULK INSERT does not accept a parameter for the file name
+            cursor.execute(f"""
+                BULK INSERT #MarketDataStaging
+                FROM '{staging_file.replace("'", "''")}'
+                WITH (FIELDTERMINATOR = '\t', ROWTERMINATOR = '0x0a', TABLOCK, BATCHSIZE = 10000)
+            """)
+            return self._merge_staging_table(cursor)
+            
+        except pyodbc.Error as e:
+            conn.rollback()
+            print(f"⚠️ BULK INSERT misslyckades ({e}) - använder fast_executemany istället")
+            self.use_bulk_insert = False
+            return self.bulk_insert_data(self.read_staging_file(staging_file))
         finally:
             cursor.close()
-            conn.close()
+            os.remove(staging_file)
+    
+    def discard_staging_file(self):
+        """Remove a staging file that will never be loaded (interrupted import)"""
+        if self._staging_file is not None:
+            self._staging_file.close()
+            os.remove(self._staging_file.name)
+            self._staging_file = None
     
     def calculate_progress_stats(self, current_timestamp: int, start_timestamp: int, end_timestamp: int, 
-                               batch_count: int, total_records: int, start_import_time: datetime):
+                               batch_count: int, total_records: int, start_import_time: float):
         """Calculate and display detailed progress statistics with examples"""
         
         # PROGRESS BERÄKNING FÖRKLARING:
@@ -161,8 +607,9 @@ class BTCDataImporter:
         # =========================
         # Använder faktisk tid vs progress för att uppskatta slutfört tid
         
-        elapsed_time = datetime.now() - start_import_time
-        elapsed_seconds = elapsed_time.total_seconds()
+        # start_import_time is a time.monotonic() value - no timezone/calendar work per report
+        elapsed_seconds = time.monotonic() - start_import_time
+        elapsed_time = timedelta(seconds=int(elapsed_seconds))
         
         if progress_percent > 0:
             # Exempel på ETA-beräkning:
@@ -171,7 +618,7 @@ class BTCDataImporter:
             # - Kvarvarande tid: 480 - 120 = 360 sekunder (6 minuter)
             estimated_total_seconds = elapsed_seconds / (progress_percent / 100)
             remaining_seconds = estimated_total_seconds - elapsed_seconds
-            eta = datetime.now() + timedelta(seconds=remaining_seconds)
+            eta = datetime.now() + timedelta(seconds=remaining_seconds)  # Only wall-clock call per report
         else:
             eta = None
         
@@ -179,32 +626,174 @@ class BTCDataImporter:
         current_date = datetime.fromtimestamp(current_timestamp/1000, tz=timezone.utc)
         
         # Display progress bar
-        bar_length = 30
-        filled_length = int(bar_length * progress_percent / 100)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
+        filled_length = int(BAR_LENGTH * progress_percent / 100)
+        bar = BAR_FULL[:filled_length] + BAR_EMPTY[filled_length:]
         
         print(f"\n📊 PROGRESS RAPPORT")
         print(f"├─ Progress: [{bar}] {progress_percent:.1f}%")
         print(f"├─ Current Date: {current_date.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"├─ Batches: {batch_count}")
         print(f"├─ Records: {total_records:,}")
-        print(f"├─ Elapsed: {str(elapsed_time).split('.')[0]}")
+        print(f"├─ Elapsed: {elapsed_time}")
         if eta:
             print(f"└─ ETA: {eta.strftime('%H:%M:%S')} ({remaining_seconds/60:.0f} min kvar)")
         else:
             print(f"└─ ETA: Beräknar...")
 
+    async def _fetch_batches(self, session: aiohttp.ClientSession, limiter: WeightRateLimiter,
+                             batch_starts: range, queue: asyncio.Queue):
+        """Producer: start one fetch task per batch and queue them in chronological order"""
+        for batch_start in batch_starts:
+            task = asyncio.create_task(
+                self.fetch_klines(session, limiter, batch_start, batch_start + self.batch_span_ms - 1)
+            )
+            await queue.put((batch_start, task))
+        await queue.put(None)
+    
+    async def _run_import(self, batch_starts: range, current_time: int, start_import_time: float):
+        """Fetch batches in parallel and write them to the database in chronological order"""
+        # Bounded queue: at most max_concurrent_requests fetches run ahead of the database writer.
+        # Batches are written in order so a restart from MAX(OpenTime) never skips a gap.
+        queue = asyncio.Queue(maxsize=self.max_concurrent_requests)
+        limiter = WeightRateLimiter(self.max_weight_per_minute, self.request_weight)
+        # One session for the whole import: connections to api.binance.com stay open (keep-alive)
+        # and are reused, so TCP/TLS handshakes only happen when the pool grows
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrent_requests,
+            keepalive_timeout=60,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=30)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            producer = asyncio.create_task(self._fetch_batches(session, limiter, batch_starts, queue))
+            
+            failed_start = None
+            write = None  # The database write running in a worker thread, if any
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    
+                    batch_start, task = item
+                    klines = await task
+                    
+                    if klines is None:
+                        # Failed fetch (not an empty window): stop here. Everything before this window
+                        # is still loaded, and the next run resumes from MAX(OpenTime) without a hole.
+                        failed_start = batch_start
+                        break
+                    
+                    self.batch_count += 1
+                    
+                    if klines:
+                        # The insert runs in a worker thread so the event loop keeps
+                        # fetching the next batches while the database commits this one.
+                        # Shielded: cancelling the await must not lose track of the running thread.
+                        write = asyncio.ensure_future(asyncio.to_thread(self._write_batch, klines))
+                        self.total_records += await asyncio.shield(write)
+                    else:
+                        gap_date = datetime.fromtimestamp(batch_start/1000, tz=timezone.utc)
+                        print(f"⚠️ Ingen data från Binance API för {gap_date.strftime('%Y-%m-%d %H:%M')}")
+                    
+                    # Next batch starts where this window ends
+                    self.next_start_time = min(batch_start + self.batch_span_ms, current_time)
+                    self._report_progress(batch_starts.start, current_time, start_import_time)
+                
+                # Load whatever is left after the last full flush
+                write = asyncio.ensure_future(asyncio.to_thread(self.flush_pending_rows))
+                self.total_records += await asyncio.shield(write)
+                
+                if failed_start is not None:
+                    failed_date = datetime.fromtimestamp(failed_start/1000, tz=timezone.utc)
+                    raise RuntimeError(f"kunde inte hämta data för {failed_date.strftime('%Y-%m-%d %H:%M')} - importen stoppades där")
+            finally:
+                producer.cancel()
+                if write is not None and not write.done():
+                    # Cancelling the await doesn't stop the thread - let it finish with the staging file first
+                    await asyncio.wait([write])
+                self.discard_staging_file()
+                while not queue.empty():
+                    item = queue.get_nowait()
+                    if item is not None:
+                        item[1].cancel()
+    
+    def _write_batch(self, klines: List) -> int:
+        """Convert a batch of klines and stage it, loading every bulk_flush_batches batches"""
+        open_ms, prices, close_ms = self.parse_klines(klines)
+        self.stage_rows(self.convert_klines_to_db_format(open_ms, prices, close_ms))
+        if self.write_parquet:
+            self.cache_parquet(open_ms, prices, close_ms)
+        self._pending_batches += 1
+        
+        if self._pending_batches >= self.bulk_flush_batches:
+            return self.flush_pending_rows()
+        return 0
+    
+    def flush_pending_rows(self) -> int:
+        """Load all staged rows into the database and commit them as one checkpoint"""
+        staging_file, self._staging_file = self._staging_file, None
+        data_batch, self._pending_rows = self._pending_rows, []
+        self._pending_batches = 0
+        
+        if staging_file is not None:
+            staging_file.close()
+            inserted = self.bulk_load_file(staging_file.name)
+        else:
+            inserted = self.bulk_insert_data(data_batch)
+        
+        self.commit_checkpoint()
+        return inserted
+    
+    def _report_progress(self, original_start_time: int, current_time: int, start_import_time: float):
+        """Print progress for the batch that was just written"""
+        batch_count = self.batch_count
+        # Nothing to print between the 5-batch updates (20/100 are multiples of 5)
+        if batch_count > 5 and batch_count % 5 != 0:
+            return
+        
+        total_records = self.total_records
+        start_time = self.next_start_time
+        
+        # Show progress every 20 batches or if it's the first few
+        if batch_count <= 5 or batch_count % 20 == 0:
+            self.calculate_progress_stats(
+                start_time, original_start_time, current_time,
+                batch_count, total_records, start_import_time
+            )
+        elif batch_count % 5 == 0:
+            # Quick update every 5 batches
+            progress = ((start_time - original_start_time) / (current_time - original_start_time) * 100)
+            current_date = datetime.fromtimestamp(start_time/1000, tz=timezone.utc)
+            print(f"📈 {progress:.1f}% - Batch {batch_count} - {current_date.strftime('%Y-%m-%d %H:%M')} - {total_records:,} records")
+        
+        # Error recovery checkpoint every 100 batches
+        if batch_count % 100 == 0:
+            checkpoint_date = datetime.fromtimestamp(start_time/1000, tz=timezone.utc)
+            print(f"� Checkpoint: {checkpoint_date.strftime('%Y-%m-%d %H:%M')} - {total_records:,} records saved")
+
     def import_historical_data(self):
         """Main function to import all historical data with enhanced progress tracking"""
         print("🚀 BTC/USDT HISTORICAL DATA IMPORTER")
         print("=" * 60)
         
+        if self.write_parquet and pa is None:
+            print("⚠️ pyarrow saknas - inga Parquet-filer skrivs")
+            self.write_parquet = False
+        
+        # Duplicate protection lives in the database (unique index + MERGE)
+        self.ensure_unique_index()
+        # One log flush per checkpoint commit is plenty - a crash only loses work that gets re-fetched
+        self.enable_delayed_durability()
+        
         # Get starting point
         start_time = self.get_latest_timestamp()
         current_time = int(datetime.now(timezone.utc).timestamp() * 1000)
         
         if start_time >= current_time:
             print("✅ Databasen är redan uppdaterad!")
+            self.rebuild_indexes()
             return
         
         # Calculate scope and batch requirements
@@ -228,104 +817,86 @@ class BTCDataImporter:
         #
         # Formeln: (total_records + batch_size - 1) // batch_size
         # Detta är "ceiling division" - avrundar alltid uppåt
-        estimated_batches = (total_minutes + self.limit - 1) // self.limit
+        #
+        # Varje batch täcker ett fast fönster på 1000 minuter, så alla startTime-värden
+        # är kända i förväg. len(range) ger exakt samma ceiling division.
+        batch_starts = range(start_time, current_time, self.batch_span_ms)
+        estimated_batches = len(batch_starts)
         
         # EXEMPEL PÅ BERÄKNING:
         # =====================
         # Scenario 1: 1 år historisk data
         # - 1 år = 365 dagar × 24 timmar × 60 minuter = 525,600 minuter
         # - 525,600 ÷ 1000 = 525.6 → 526 batches
-        # - Tid: 526 × 0.1 sekund = 52.6 sekunder (med rate limiting)
+        # - Tid: 526 × vikt 2 ÷ 1150 vikt per minut ≈ 0.9 minuter (Binance rate limit)
         #
         # Scenario 2: Från Binance start (Aug 2017) till idag (~8 år)
         # - 8 år ≈ 4,200,000 minuter
         # - 4,200,000 ÷ 1000 = 4,200 batches
-        # - Tid: 4,200 × 0.1 sekund = 420 sekunder = 7 minuter
+        # - Tid: 4,200 × vikt 2 ÷ 1150 vikt per minut ≈ 7.3 minuter
         
         print(f"📅 Period: {start_date.strftime('%Y-%m-%d %H:%M')} → {end_date.strftime('%Y-%m-%d %H:%M')}")
         print(f"📊 Uppskattade datapunkter: {total_minutes:,}")
         print(f"📊 Uppskattade batches: {estimated_batches:,}")
-        print(f"⏰ Uppskattad tid: {estimated_batches * 0.1 / 60:.0f}-{estimated_batches * 0.5 / 60:.0f} minuter")
+        # Rate limit är den enda fasta gränsen - nätverk och databas kan bara göra det långsammare
+        print(f"⏰ Uppskattad tid: minst {estimated_batches * self.request_weight / self.max_weight_per_minute:.1f} minuter (Binance rate limit)")
         print(f"� Lagrar i: MarketData (Symbol='BTC', TimeFrame='1m')")
         print("=" * 60)
         
         # Import tracking
-        total_records = 0
-        batch_count = 0
-        start_import_time = datetime.now()
+        self.total_records = 0
+        self.batch_count = 0
+        self.next_start_time = start_time
+        start_import_time = time.monotonic()
         original_start_time = start_time
         
+        # Full-history load: maintaining secondary indexes row by row is slower than one rebuild at the end
+        if start_time == self.start_timestamp:
+            self.disable_secondary_indexes()
+        
         try:
-            while start_time < current_time:
-                batch_count += 1
-                
-                # Fetch data from Binance
-                klines = self.fetch_klines(start_time)
-                
-                if not klines:
-                    print("⚠️ Ingen mer data tillgänglig från Binance API")
-                    break
-                
-                # Convert to database format
-                db_data = []
-                for kline in klines:
-                    db_record = self.convert_kline_to_db_format(kline)
-                    db_data.append(db_record)
-                
-                # Insert into database
-                inserted = self.bulk_insert_data(db_data)
-                total_records += inserted
-                
-                # Update start_time for next batch
-                if klines:
-                    start_time = klines[-1][0] + 1
-                
-                # Show progress every 20 batches or if it's the first few
-                if batch_count <= 5 or batch_count % 20 == 0:
-                    self.calculate_progress_stats(
-                        start_time, original_start_time, current_time,
-                        batch_count, total_records, start_import_time
-                    )
-                elif batch_count % 5 == 0:
-                    # Quick update every 5 batches
-                    progress = ((start_time - original_start_time) / (current_time - original_start_time) * 100)
-                    current_date = datetime.fromtimestamp(start_time/1000, tz=timezone.utc)
-                    print(f"📈 {progress:.1f}% - Batch {batch_count} - {current_date.strftime('%Y-%m-%d %H:%M')} - {total_records:,} records")
-                
-                # Rate limiting - respekterar Binance limits
-                time.sleep(0.1)
-                
-                # Error recovery checkpoint every 100 batches
-                if batch_count % 100 == 0:
-                    checkpoint_date = datetime.fromtimestamp(start_time/1000, tz=timezone.utc)
-                    print(f"� Checkpoint: {checkpoint_date.strftime('%Y-%m-%d %H:%M')} - {total_records:,} records saved")
+            asyncio.run(self._run_import(batch_starts, current_time, start_import_time))
         
         except KeyboardInterrupt:
-            print(f"\n⚠️ Import avbruten av användare vid batch {batch_count}")
-            print(f"💾 {total_records:,} records har sparats i databasen")
-            checkpoint_date = datetime.fromtimestamp(start_time/1000, tz=timezone.utc)
+            print(f"\n⚠️ Import avbruten av användare vid batch {self.batch_count}")
+            print(f"💾 {self.total_records:,} records har sparats i databasen")
+            # Rows since the last checkpoint are rolled back and fetched again on the next run
+            self.get_database_connection().rollback()
+            checkpoint_date = datetime.fromtimestamp(self.get_latest_timestamp()/1000, tz=timezone.utc)
             print(f"🔄 Nästa start: {checkpoint_date.strftime('%Y-%m-%d %H:%M')}")
             return
         
         except Exception as e:
             print(f"\n❌ Fel under import: {e}")
-            print(f"� {total_records:,} records har sparats innan felet")
+            print(f"� {self.total_records:,} records har sparats innan felet")
             return
         
+        finally:
+            # Also runs on Ctrl-C so the table is never left without its indexes
+            self.rebuild_indexes()
+            # Write the last (possibly partial) day - a resumed run appends to it
+            self.flush_parquet_day()
+        
         # Final statistics
-        elapsed_time = datetime.now() - start_import_time
+        elapsed_seconds = time.monotonic() - start_import_time
         print("\n" + "=" * 60)
         print("🎉 IMPORT SLUTFÖRD!")
-        print(f"📊 Totalt antal records: {total_records:,}")
-        print(f"📊 Antal batches: {batch_count}")
-        print(f"⏰ Total tid: {str(elapsed_time).split('.')[0]}")
-        print(f"⚡ Hastighet: {total_records/elapsed_time.total_seconds():.0f} records/sekund")
+        print(f"📊 Totalt antal records: {self.total_records:,}")
+        print(f"📊 Antal batches: {self.batch_count}")
+        print(f"⏰ Total tid: {timedelta(seconds=int(elapsed_seconds))}")
+        print(f"⚡ Hastighet: {self.total_records/elapsed_seconds:.0f} records/sekund")
         print(f"📅 Data täcker nu: {datetime.fromtimestamp(original_start_time/1000, tz=timezone.utc).strftime('%Y-%m-%d')} → {datetime.now().strftime('%Y-%m-%d')}")
         print("=" * 60)
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Import BTC/USDT 1m candles from Binance into MarketData")
+    parser.add_argument('--parquet', action='store_true',
+                        help="also write per-day Parquet files under data/BTC/1m (needs pyarrow)")
+    args = parser.parse_args()
+    
     importer = BTCDataImporter()
+    importer.write_parquet = args.parquet
     
     try:
         importer.import_historical_data()
@@ -333,6 +904,8 @@ def main():
         print("\n⚠️ Import interrupted by user")
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
+    finally:
+        importer.close_database_connection()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,48 +1,71 @@
 #!/usr/bin/env python3
 import sqlite3
-import os
+from itertools import chain
+from pathlib import Path
+
+# SQLite allows at most 10 attached databases per connection by default
+MAX_ATTACHED = 10
 
 # Check if we can find any database files
 print("Looking for database files...")
 
 # Check for SQLite database files in current directory
-for file in os.listdir('.'):
-    if file.endswith('.db') or file.endswith('.sqlite') or file.endswith('.sqlite3'):
-        print(f"Found SQLite database: {file}")
+db_files = sorted(chain(Path('.').glob('*.db'), Path('.').glob('*.sqlite'), Path('.').glob('*.sqlite3')))
+
+# Attach the files to one in-memory connection so a single query finds every MarketData table
+conn = sqlite3.connect(':memory:')
+for start in range(0, len(db_files), MAX_ATTACHED):
+    attached = {}
+    for i, path in enumerate(db_files[start:start + MAX_ATTACHED]):
+        print(f"Found SQLite database: {path}")
+        try:
+            conn.execute(f"ATTACH DATABASE ? AS db{i}", (str(path),))
+            attached[f"db{i}"] = path
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+    
+    if not attached:
+        continue
+    
+    cursor = conn.cursor()
+    cursor.execute(" UNION ALL ".join(
+        f"SELECT '{alias}' FROM {alias}.sqlite_master WHERE type='table' AND name='MarketData'"
+        for alias in attached
+    ))
+    
+    for (alias,) in cursor.fetchall():
+        file = attached[alias]
         try:
-            conn = sqlite3.connect(file)
-            cursor = conn.cursor()
+            print(f"MarketData table found in {file}")
             
-            # Check if MarketData table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='MarketData'")
-            if cursor.fetchone():
-                print(f"MarketData table found in {file}")
-                
-                # Get table info
-                cursor.execute("SELECT COUNT(*) FROM MarketData")
-                count = cursor.fetchone()[0]
-                print(f"Total records: {count}")
-                
-                if count > 0:
-                    # Get date range
-                    cursor.execute("SELECT MIN(OpenTime), MAX(OpenTime) FROM MarketData WHERE Symbol = 'BTC'")
-                    result = cursor.fetchone()
-                    print(f"BTC Date range: {result[0]} to {result[1]}")
-                    
-                    # Get sample records
-                    cursor.execute("SELECT * FROM MarketData WHERE Symbol = 'BTC' ORDER BY OpenTime LIMIT 3")
-                    records = cursor.fetchall()
-                    print("Sample records:")
-                    for record in records:
-                        print(f"  {record}")
+            # Get table info
+            cursor.execute(f"SELECT COUNT(*) FROM {alias}.MarketData")
+            count = cursor.fetchone()[0]
+            print(f"Total records: {count}")
             
-            conn.close()
+            if count > 0:
+                # Get date range
+                cursor.execute(f"SELECT MIN(OpenTime), MAX(OpenTime) FROM {alias}.MarketData WHERE Symbol = 'BTC'")
+                result = cursor.fetchone()
+                print(f"BTC Date range: {result[0]} to {result[1]}")
+                
+                # Get sample records
+                cursor.execute(f"SELECT * FROM {alias}.MarketData WHERE Symbol = 'BTC' ORDER BY OpenTime LIMIT 3")
+                records = cursor.fetchall()
+                print("Sample records:")
+                for record in records:
+                    print(f"  {record}")
         except Exception as e:
             print(f"Error reading {file}: {e}")
+    
+    for alias in attached:
+        conn.execute(f"DETACH DATABASE {alias}")
+conn.close()
 
 print("\nChecking SQL Server connection...")
 try:
     import pyodbc
+    from concurrent.futures import ThreadPoolExecutor, as_completed
     
     # Try different connection strings
     connection_strings = [
@@ -51,62 +74,88 @@ try:
         "DRIVER={SQL Server};SERVER=localhost,1433;DATABASE=MyFirstDatabase;UID=sa;PWD=MyPassword123#"
     ]
     
-    for conn_str in connection_strings:
-        try:
-            print(f"Trying: {conn_str.split(';')[0]}...")
-            conn = pyodbc.connect(conn_str)
-            cursor = conn.cursor()
-            
-            print("✅ SQL Server connection successful!")
+    # Only try drivers that are actually installed
+    installed_drivers = set(pyodbc.drivers())
+    candidates = [conn_str for conn_str in connection_strings
+                  if conn_str.split(';')[0][len('DRIVER={'):-1] in installed_drivers]
+    
+    def close_if_connected(future):
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+    
+    # Probe all installed drivers at once with a 2 s login timeout and keep the first
+    # connection that succeeds, instead of waiting out a full timeout per driver in turn
+    conn = None
+    with ThreadPoolExecutor(max_workers=max(len(candidates), 1)) as pool:
+        futures = {pool.submit(pyodbc.connect, conn_str, timeout=2): conn_str for conn_str in candidates}
+        for future in as_completed(futures):
+            driver = futures[future].split(';')[0]
+            try:
+                conn = future.result()
+                print(f"Connected with: {driver}")
+                break
+            except Exception as e:
+                print(f"❌ Failed ({driver}): {e}")
+        
+        # Slower attempts that also succeed are closed right away
+        for other in futures:
+            if conn is None or other is not future:
+                other.add_done_callback(close_if_connected)
+    
+    if conn is None:
+        print("❌ Could not connect to SQL Server with any connection string")
+    else:
+        cursor = conn.cursor()
+        
+        print("✅ SQL Server connection successful!")
+        
+        # All summary queries in one batch - one network round trip, results read with nextset()
+        cursor.execute("""
+            SET NOCOUNT ON;
+            SELECT COUNT(*),
+                   COUNT(CASE WHEN Symbol = 'BTC' THEN 1 END),
+                   MIN(CASE WHEN Symbol = 'BTC' THEN OpenTime END),
+                   MAX(CASE WHEN Symbol = 'BTC' THEN OpenTime END)
+            FROM MarketData;
+            SELECT Symbol, COUNT(*) FROM MarketData GROUP BY Symbol;
+            SELECT TOP 3 Symbol, OpenTime, ClosePrice FROM MarketData WHERE Symbol = 'BTC' ORDER BY OpenTime DESC;
+        """)
+        total_count, btc_count, btc_first, btc_last = cursor.fetchone()
+        cursor.nextset()
+        data = cursor.fetchall()
+        cursor.nextset()
+        recent_data = cursor.fetchall()
+        
+        # Check MarketData table
+        print(f"Total MarketData records: {total_count}")
+        
+        # Check BTC specifically
+        print(f"BTC records: {btc_count}")
+        
+        if btc_count > 0:
+            # Get BTC date range
+            print(f"BTC Date range: {btc_first} to {btc_last}")
             
-            # Check MarketData table
-            cursor.execute("SELECT COUNT(*) FROM MarketData")
-            total_count = cursor.fetchone()[0]
-            print(f"Total MarketData records: {total_count}")
+            # Check what symbols exist
+            symbols = [row[0] for row in data]
+            print(f"Available symbols: {symbols}")
             
-            # Check BTC specifically
-            cursor.execute("SELECT COUNT(*) FROM MarketData WHERE Symbol = 'BTC'")
-            btc_count = cursor.fetchone()[0]
-            print(f"BTC records: {btc_count}")
+            # Sample recent data
+            print("Most recent BTC data:")
+            for row in recent_data:
+                print(f"  {row[0]} - {row[1]} - ${row[2]:,.2f}")
+        else:
+            print("⚠️  No BTC data found!")
             
-            if btc_count > 0:
-                # Get BTC date range
-                cursor.execute("SELECT MIN(OpenTime), MAX(OpenTime) FROM MarketData WHERE Symbol = 'BTC'")
-                result = cursor.fetchone()
-                print(f"BTC Date range: {result[0]} to {result[1]}")
-                
-                # Check what symbols exist
-                cursor.execute("SELECT DISTINCT Symbol FROM MarketData")
-                symbols = [row[0] for row in cursor.fetchall()]
-                print(f"Available symbols: {symbols}")
-                
-                # Sample recent data
-                cursor.execute("SELECT TOP 3 Symbol, OpenTime, ClosePrice FROM MarketData WHERE Symbol = 'BTC' ORDER BY OpenTime DESC")
-                recent_data = cursor.fetchall()
-                print("Most recent BTC data:")
-                for row in recent_data:
-                    print(f"  {row[0]} - {row[1]} - ${row[2]:,.2f}")
+            # Check what data exists
+            if data:
+                print("Available data by symbol:")
+                for symbol, count in data:
+                    print(f"  {symbol}: {count} records")
             else:
-                print("⚠️  No BTC data found!")
-                
-                # Check what data exists
-                cursor.execute("SELECT DISTINCT Symbol, COUNT(*) FROM MarketData GROUP BY Symbol")
-                data = cursor.fetchall()
-                if data:
-                    print("Available data by symbol:")
-                    for symbol, count in data:
-                        print(f"  {symbol}: {count} records")
-                else:
-                    print("❌ MarketData table is empty!")
-            
-            conn.close()
-            break
-            
-        except Exception as e:
-            print(f"❌ Failed: {e}")
-            continue
-    else:
-        print("❌ Could not connect to SQL Server with any connection string")
+                print("❌ MarketData table is empty!")
+        
+        conn.close()
         
 except ImportError:
     print("❌ pyodbc not available")
@@ -1,14 +1,46 @@
 #!/usr/bin/env python3
 """
-Fast import MarketData from CSV backup file
+Fast import MarketData from a Parquet or CSV backup file
 Much faster than downloading from API
 """
 
-import pymssql
+import pyodbc
 import csv
+import gzip
+import io
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Column types for pandas.read_csv - timestamps are parsed separately via parse_dates
+CSV_DTYPES = {
+    'Symbol': 'string', 'TimeFrame': 'string',
+    'OpenPrice': 'float64', 'HighPrice': 'float64', 'LowPrice': 'float64', 'ClosePrice': 'float64', 'Volume': 'float64'
+}
+CSV_DATE_COLUMNS = ['OpenTime', 'CloseTime', 'CreatedAt']
+
+# Row count from partition metadata - instant, where COUNT(*) scans the whole table
+ROW_COUNT_SQL = """
+    SELECT ISNULL(SUM(row_count), 0) FROM sys.dm_db_partition_stats
+    WHERE object_id = OBJECT_ID('MarketData') AND index_id IN (0, 1)
+"""
+
+# BULK INSERT errors meaning the server can't open the file (missing path, no access), matched on the
+# message number pyodbc puts in the error text. Only these fall back to the row-by-row import.
+BULK_FILE_ERRORS = ('(4860)', '(4861)')
+
 class MarketDataImporter:
     def __init__(self):
         self.server = "localhost"
@@ -16,15 +48,21 @@ class MarketDataImporter:
         self.database = "MyFirstDatabase"
         self.username = "sa"
         self.password = "MyPassword123#"
+        self.insert_workers = 4  # Parallel insert connections for the row-by-row import
+        self._conn = None  # One connection shared by all steps, closed in main()
+        self.backup_rows = None  # Data rows in the last imported file (invalid ones included), checked by verify_data
+        self.skip_existing = False  # Set when existing rows are kept - inserts then skip rows already in the table
         
     def connect(self):
         """Connect to SQL Server database"""
         try:
-            conn = pymssql.connect(
-                server=f"{self.server}:{self.port}",
-                user=self.username,
-                password=self.password,
-                database=self.database
+            conn = pyodbc.connect(
+                "DRIVER={ODBC Driver 18 for SQL Server};"
+                f"SERVER={self.server},{self.port};"
+                f"DATABASE={self.database};"
+                f"UID={self.username};"
+                f"PWD={self.password};"
+                "TrustServerCertificate=yes"
             )
             print(f"✅ Connected to database: {self.database}")
             return conn
@@ -32,11 +70,24 @@ class MarketDataImporter:
             print(f"❌ Database connection failed: {e}")
             return None
 
+    def _get_conn(self):
+        """Return the shared database connection, connecting on first use"""
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn
+
+    def close_connection(self):
+        """Close the shared database connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
     def clear_existing_data(self, conn):
         """Clear existing MarketData (optional)"""
+        self.skip_existing = False
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM MarketData")
+            cursor.execute(ROW_COUNT_SQL)
             existing_count = cursor.fetchone()[0]
             
             if existing_count > 0:
@@ -44,90 +95,55 @@ class MarketDataImporter:
                 print("❓ Clear existing data first? (y/n): ", end="")
                 if input().lower() == 'y':
                     print("🗑️  Clearing existing data...")
-                    cursor.execute("DELETE FROM MarketData")
+                    # Minimally logged, unlike DELETE. Also resets the Id seed, which suits a full re-import.
+                    cursor.execute("TRUNCATE TABLE MarketData")
                     conn.commit()
                     print("✅ Existing data cleared")
                 else:
-                    print("ℹ️  Keeping existing data (may create duplicates)")
+                    # The unique (Symbol, TimeFrame, OpenTime) index would reject the overlapping rows
+                    print("ℹ️  Keeping existing data (rows already in the table are skipped)")
+                    self.skip_existing = True
             
         except Exception as e:
             print(f"❌ Failed to check existing data: {e}")
 
-    def import_from_csv(self, csv_file):
-        """Import MarketData from CSV file with bulk insert"""
-        if not os.path.exists(csv_file):
-            print(f"❌ File not found: {csv_file}")
+    def import_backup(self, backup_file):
+        """Import MarketData from a Parquet or CSV backup file"""
+        if not os.path.exists(backup_file):
+            print(f"❌ File not found: {backup_file}")
+            return False
+        
+        if backup_file.endswith('.parquet') and pq is None:
+            print("❌ pyarrow is not installed - can't read Parquet backups")
             return False
             
-        conn = self.connect()
+        conn = self._get_conn()
         if not conn:
             return False
             
         try:
+            self.backup_rows = None
+            
             # Optional: Clear existing data
             self.clear_existing_data(conn)
             
-            cursor = conn.cursor()
-            
-            # Count total rows in CSV
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                total_rows = sum(1 for line in f) - 1  # Subtract header
-            print(f"📊 Total rows to import: {total_rows:,}")
-            
-            # Import with bulk insert for speed
-            batch_size = 1000  # Adjust based on memory/performance
-            batch_data = []
-            rows_imported = 0
+            print(f"📊 File size: {os.path.getsize(backup_file) / (1024 * 1024):.1f} MB")
             
-            with open(csv_file, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    try:
-                        # Convert string timestamps back to datetime
-                        open_time = datetime.strptime(row['OpenTime'], "%Y-%m-%d %H:%M:%S")
-                        close_time = datetime.strptime(row['CloseTime'], "%Y-%m-%d %H:%M:%S") if row['CloseTime'] else None
-                        created_at = datetime.strptime(row['CreatedAt'], "%Y-%m-%d %H:%M:%S") if row['CreatedAt'] else None
-                        
-                        batch_data.append((
-                            row['Symbol'],
-                            row['TimeFrame'],
-                            open_time,
-                            float(row['OpenPrice']),
-                            float(row['HighPrice']),
-                            float(row['LowPrice']),
-                            float(row['ClosePrice']),
-                            float(row['Volume']),
-                            close_time,
-                            created_at
-                        ))
-                        
-                        # Execute batch when full
-                        if len(batch_data) >= batch_size:
-                            self.execute_batch(cursor, batch_data)
-                            conn.commit()
-                            rows_imported += len(batch_data)
-                            batch_data = []
-                            
-                            # Progress update
-                            progress = (rows_imported / total_rows) * 100
-                            print(f"📝 Progress: {rows_imported:,}/{total_rows:,} ({progress:.1f}%)")
-                    
-                    except ValueError as e:
-                        print(f"⚠️  Skipping invalid row: {e}")
-                        continue
-                
-                # Execute remaining batch
-                if batch_data:
-                    self.execute_batch(cursor, batch_data)
-                    conn.commit()
-                    rows_imported += len(batch_data)
+            if backup_file.endswith('.parquet'):
+                # Binary columns - nothing to parse, the batches go straight to the insert workers
+                rows_imported = self.insert_rows(conn, self.read_parquet_batches(backup_file))
+            else:
+                # SQL Server reads the file itself; row-by-row inserts only if it can't reach the file
+                rows_imported = self.bulk_insert_from_csv(conn, backup_file)
+                if rows_imported is None:
+                    rows_imported = self.insert_rows(conn, self.read_batches(backup_file))
             
             print(f"✅ Import completed!")
             print(f"📊 Rows imported: {rows_imported:,}")
             
             # Verify import
-            cursor.execute("SELECT COUNT(*) FROM MarketData")
+            cursor = conn.cursor()
+            cursor.execute(ROW_COUNT_SQL)
             final_count = cursor.fetchone()[0]
             print(f"📈 Total rows in database: {final_count:,}")
             
@@ -137,23 +153,223 @@ class MarketDataImporter:
             print(f"❌ Import failed: {e}")
             conn.rollback()
             return False
+
+    def bulk_insert_from_csv(self, conn, csv_file):
+        """Load the CSV with BULK INSERT, returns rows imported or None if the server can't read the file"""
+        if csv_file.endswith('.gz'):
+            # SQL Server can't read compressed files
+            print("ℹ️  Compressed backup - importing row by row")
+            return None
+        
+        # The path must be valid on the SQL Server machine (same host or a shared volume)
+        csv_path = os.path.abspath(csv_file).replace("'", "''")
+        
+        try:
+            print("📝 Loading with BULK INSERT...")
+            cursor = conn.cursor()
+            
+            # The CSV has no Id column, so load into a staging table with the CSV's layout.
+            # FLOAT prices also accept the 1e-05 style values the Python export can write.
+            cursor.execute("""
+                CREATE TABLE #MarketDataImport (
+                    Symbol NVARCHAR(10), TimeFrame NVARCHAR(10), OpenTime DATETIME2(7),
+                    OpenPrice FLOAT, HighPrice FLOAT, LowPrice FLOAT, ClosePrice FLOAT, Volume FLOAT,
+                    CloseTime DATETIME2(7), CreatedAt DATETIME2(7)
+                )
+            """)
+            # MAXERRORS = 0: a bad row fails the load instead of being skipped, so every data line is counted
+            cursor.execute(f"""
+                BULK INSERT #MarketDataImport FROM '{csv_path}'
+                WITH (FORMAT = 'CSV', FIRSTROW = 2, FIELDTERMINATOR = ',', ROWTERMINATOR = '0x0a',
+                      TABLOCK, BATCHSIZE = 100000, MAXERRORS = 0)
+            """)
+            file_rows = cursor.rowcount
+            cursor.execute("""
+                INSERT INTO MarketData WITH (TABLOCK)
+                    (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime, CreatedAt)
+                SELECT Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume,
+                       CloseTime, COALESCE(CreatedAt, GETDATE())
+                FROM #MarketDataImport AS i
+            """ + ("""
+                WHERE NOT EXISTS (SELECT 1 FROM MarketData AS m
+                                  WHERE m.Symbol = i.Symbol AND m.TimeFrame = i.TimeFrame AND m.OpenTime = i.OpenTime)
+            """ if self.skip_existing else ""))
+            rows_imported = cursor.rowcount
+            cursor.execute("DROP TABLE #MarketDataImport")
+            conn.commit()
+            
+            self.backup_rows = file_rows
+            return rows_imported
+            
+        except pyodbc.Error as e:
+            conn.rollback()
+            if not any(code in str(e) for code in BULK_FILE_ERRORS):
+                raise
+            print(f"⚠️  BULK INSERT not available - importing row by row: {e}")
+            return None
+
+    def insert_rows(self, conn, batch_reader):
+        """Insert the (batch, progress %) pairs from batch_reader, returns rows imported"""
+        # This thread parses the file while the workers insert, each on its own connection.
+        # Every batch is committed on its own, so a worker's key locks are released right away - another
+        # worker inserting the same key waits for one batch at most instead of hanging on an open transaction.
+        connections = [conn] + [c for c in (self.connect() for _ in range(self.insert_workers - 1)) if c]
+        batches = queue.Queue(maxsize=2 * len(connections))
+        stop = threading.Event()  # Set by a failing worker so the rest of the file isn't parsed for nothing
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(connections)) as pool:
+                workers = [pool.submit(self.insert_worker, c, batches, stop) for c in connections]
+                rows_read = 0
+                
+                try:
+                    for batch_data, progress in batch_reader:
+                        if stop.is_set():
+                            break
+                        batches.put(batch_data)  # Blocks while the workers are behind
+                        rows_read += len(batch_data)
+                        
+                        # Progress update
+                        print(f"📝 Progress: {rows_read:,} rows ({progress:.1f}%)")
+                finally:
+                    for _ in workers:
+                        batches.put(None)
+                
+                return sum(worker.result() for worker in workers)
+        
         finally:
-            conn.close()
+            for worker_conn in connections[1:]:
+                worker_conn.close()
+
+    def read_batches(self, csv_file, batch_size=50000):
+        """Parse the CSV into lists of row tuples ready for execute_batch, yields (batch, progress %)"""
+        # Progress is based on bytes read, so the file isn't read an extra time just to count rows
+        total_bytes = os.path.getsize(csv_file)
+        rows_read = 0  # Every data line, also the ones skipped as invalid
+        
+        # fast_executemany sends the whole batch at once, so batches can be large
+        with open(csv_file, 'rb') as raw:
+            # raw.tell() is the position in the file on disk, also for compressed files
+            stream = gzip.GzipFile(fileobj=raw) if csv_file.endswith('.gz') else raw
+            
+            if pd is not None:
+                # C tokenizer and vectorized date parsing instead of strptime per row
+                for chunk in pd.read_csv(stream, dtype=CSV_DTYPES, parse_dates=CSV_DATE_COLUMNS,
+                                         compression=None, chunksize=batch_size):
+                    rows_read += len(chunk)
+                    yield list(chunk.itertuples(index=False, name=None)), raw.tell() / total_bytes * 100
+                self.backup_rows = rows_read
+                return
+            
+            batch_data = []
+            # Positional rows instead of a dict per row - the export always writes the columns in the same order
+            reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8'))
+            next(reader, None)  # Skip header
+            
+            for row in reader:
+                rows_read += 1
+                try:
+                    # Convert string timestamps back to datetime ('YYYY-MM-DD HH:MM:SS' is ISO format,
+                    # and fromisoformat is much faster than strptime)
+                    open_time = datetime.fromisoformat(row[2])
+                    close_time = datetime.fromisoformat(row[8]) if row[8] else None
+                    created_at = datetime.fromisoformat(row[9]) if row[9] else None
+                    
+                    batch_data.append((
+                        row[0],  # Symbol
+                        row[1],  # TimeFrame
+                        open_time,
+                        float(row[3]),  # OpenPrice
+                        float(row[4]),  # HighPrice
+                        float(row[5]),  # LowPrice
+                        float(row[6]),  # ClosePrice
+                        float(row[7]),  # Volume
+                        close_time,
+                        created_at
+                    ))
+                    
+                    # Hand over the batch when full
+                    if len(batch_data) >= batch_size:
+                        yield batch_data, raw.tell() / total_bytes * 100
+                        batch_data = []
+                
+                except (ValueError, IndexError) as e:
+                    print(f"⚠️  Skipping invalid row: {e}")
+                    continue
+        
+            # Remaining batch
+            if batch_data:
+                yield batch_data, raw.tell() / total_bytes * 100
+            self.backup_rows = rows_read
+
+    def read_parquet_batches(self, parquet_file, batch_size=50000):
+        """Read a Parquet backup as lists of row tuples ready for execute_batch, yields (batch, progress %)"""
+        parquet = pq.ParquetFile(parquet_file)
+        self.backup_rows = parquet.metadata.num_rows
+        total_rows = max(parquet.metadata.num_rows, 1)
+        rows_read = 0
+        
+        for batch in parquet.iter_batches(batch_size=batch_size):
+            # Column-wise conversion to Python values, then zipped into rows
+            batch_data = list(zip(*(column.to_pylist() for column in batch.columns)))
+            rows_read += len(batch_data)
+            yield batch_data, rows_read / total_rows * 100
+
+    def insert_worker(self, conn, batches, stop):
+        """Insert batches from the queue until the None marker, returns rows inserted (sets stop on error)"""
+        rows_inserted = 0
+        error = None
+        
+        try:
+            cursor = conn.cursor()
+            # Send each batch as one parameter array instead of one INSERT round trip per row
+            cursor.fast_executemany = True
+        except Exception as e:
+            error = e
+            stop.set()
+        
+        while True:
+            batch_data = batches.get()
+            if batch_data is None:
+                break
+            # After an error keep draining the queue so the reader never blocks on a full queue
+            if error is None:
+                try:
+                    self.execute_batch(cursor, batch_data)
+                    conn.commit()
+                    rows_inserted += len(batch_data)
+                except Exception as e:
+                    conn.rollback()
+                    error = e
+                    stop.set()
+        
+        if error is not None:
+            raise error
+        return rows_inserted
 
     def execute_batch(self, cursor, batch_data):
         """Execute batch insert for performance"""
         if not batch_data:
             return
             
-        # Use executemany for better performance (excluding Id as it's IDENTITY)
-        cursor.executemany("""
-            INSERT INTO MarketData (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime, CreatedAt)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, batch_data)
+        # fast_executemany packs the rows into parameter arrays (excluding Id as it's IDENTITY)
+        if self.skip_existing:
+            cursor.executemany("""
+                INSERT INTO MarketData (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime, CreatedAt)
+                SELECT v.* FROM (VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?))
+                    AS v (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime, CreatedAt)
+                WHERE NOT EXISTS (SELECT 1 FROM MarketData AS m
+                                  WHERE m.Symbol = v.Symbol AND m.TimeFrame = v.TimeFrame AND m.OpenTime = v.OpenTime)
+            """, batch_data)
+        else:
+            cursor.executemany("""
+                INSERT INTO MarketData (Symbol, TimeFrame, OpenTime, OpenPrice, HighPrice, LowPrice, ClosePrice, Volume, CloseTime, CreatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, batch_data)
 
-    def verify_data(self, csv_file):
-        """Verify imported data matches CSV file"""
-        conn = self.connect()
+    def verify_data(self, backup_file):
+        """Verify imported data matches the backup file"""
+        conn = self._get_conn()
         if not conn:
             return
             
@@ -161,18 +377,21 @@ class MarketDataImporter:
             cursor = conn.cursor()
             
             # Count rows in database
-            cursor.execute("SELECT COUNT(*) FROM MarketData")
+            cursor.execute(ROW_COUNT_SQL)
             db_count = cursor.fetchone()[0]
             
-            # Count rows in CSV
-            with open(csv_file, 'r') as f:
-                csv_count = sum(1 for line in f) - 1  # Subtract header
-            
+            # The import already counted the file's rows (skipped invalid ones included), so the
+            # file isn't read again here
             print(f"\n🔍 Data Verification:")
-            print(f"   CSV file rows: {csv_count:,}")
+            print(f"   Backup file size: {os.path.getsize(backup_file) / (1024 * 1024):.1f} MB")
+            if self.backup_rows is not None:
+                print(f"   Backup file rows: {self.backup_rows:,}")
             print(f"   Database rows: {db_count:,}")
             
-            if db_count == csv_count:
+            if self.backup_rows is None:
+                print("ℹ️  No import in this run - nothing to compare")
+            elif db_count == self.backup_rows or (self.skip_existing and db_count > self.backup_rows):
+                # With existing data kept the table also holds rows that aren't in the file
                 print("✅ Data verification successful!")
             else:
                 print("⚠️  Row count mismatch - some data may be missing")
@@ -191,54 +410,55 @@ class MarketDataImporter:
                 
         except Exception as e:
             print(f"❌ Verification failed: {e}")
-        finally:
-            conn.close()
 
 def main():
     importer = MarketDataImporter()
     
-    print("🚀 MarketData Fast Import Tool")
-    print("=" * 50)
+    try:
+        print("🚀 MarketData Fast Import Tool")
+        print("=" * 50)
     
-    # List available backup files
-    backup_files = [f for f in os.listdir('.') if f.startswith('market_data_backup_') and f.endswith('.csv')]
+        # List available backup files
+        backup_files = [f for f in os.listdir('.') if f.startswith('market_data_backup_') and f.endswith(('.parquet', '.csv', '.csv.gz'))]
     
-    if not backup_files:
-        print("❌ No backup files found")
-        print("💡 Run export_market_data.py first to create a backup file")
-        return
+        if not backup_files:
+            print("❌ No backup files found")
+            print("💡 Run export_market_data.py first to create a backup file")
+            return
     
-    print("📁 Available backup files:")
-    for i, file in enumerate(backup_files, 1):
-        size = os.path.getsize(file) / (1024 * 1024)  # MB
-        print(f"   {i}. {file} ({size:.1f} MB)")
+        print("📁 Available backup files:")
+        for i, file in enumerate(backup_files, 1):
+            size = os.path.getsize(file) / (1024 * 1024)  # MB
+            print(f"   {i}. {file} ({size:.1f} MB)")
     
-    # Get user choice
-    try:
-        choice = int(input(f"\n❓ Select file to import (1-{len(backup_files)}): "))
-        if choice < 1 or choice > len(backup_files):
-            print("❌ Invalid selection")
-            return
+        # Get user choice
+        try:
+            choice = int(input(f"\n❓ Select file to import (1-{len(backup_files)}): "))
+            if choice < 1 or choice > len(backup_files):
+                print("❌ Invalid selection")
+                return
         
-        selected_file = backup_files[choice - 1]
-    except ValueError:
-        print("❌ Invalid input")
-        return
+            selected_file = backup_files[choice - 1]
+        except ValueError:
+            print("❌ Invalid input")
+            return
     
-    print(f"\n🔄 Starting import from: {selected_file}")
-    start_time = datetime.now()
+        print(f"\n🔄 Starting import from: {selected_file}")
+        start_time = datetime.now()
     
-    if importer.import_from_csv(selected_file):
-        duration = datetime.now() - start_time
-        print(f"⏱️  Import completed in: {duration}")
+        if importer.import_backup(selected_file):
+            duration = datetime.now() - start_time
+            print(f"⏱️  Import completed in: {duration}")
         
-        # Verify the import
-        importer.verify_data(selected_file)
+            # Verify the import
+            importer.verify_data(selected_file)
         
-        print(f"\n🎉 Your database is ready!")
-        print(f"💡 This was much faster than downloading from Binance API!")
-    else:
-        print("❌ Import failed")
+            print(f"\n🎉 Your database is ready!")
+            print(f"💡 This was much faster than downloading from Binance API!")
+        else:
+            print("❌ Import failed")
+    finally:
+        importer.close_connection()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file